@@ -0,0 +1,103 @@
+# backend/app/batcher.py
+import asyncio
+import logging
+from .retrieval import retrieve_contexts
+
+logger = logging.getLogger(__name__)
+
+class RetrievalBatcher:
+    """
+    Coalesces concurrent /retrieve queries into batches, so the embedder and the FAISS
+    search run once per batch instead of once per query.
+
+    Queries are collected until `max_batch_size` are pending or `max_wait` seconds have
+    passed since the first one arrived. The batch then runs in a worker thread so the
+    event loop keeps accepting requests.
+    """
+
+    def __init__(self, texts, embedder, index, top_k: int = 10, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.texts = texts
+        self.embedder = embedder
+        self.index = index
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        """
+        Starts the background task that processes batches. Must be called from the event loop.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the background task and cancels any queries still waiting for a batch.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def retrieve(self, query: str) -> list[str]:
+        """
+        Queues a query for the next batch and waits for its results.
+
+        Args:
+            query (str): The user's natural language query.
+
+        Returns:
+            list[str]: A list of top_k most relevant text contexts.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _next_batch(self):
+        """
+        Waits for a first query, then collects more until the batch is full or max_wait expires.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            queries = [query for query, _ in batch]
+            try:
+                results = await asyncio.to_thread(
+                    retrieve_contexts, queries, self.texts, self.embedder, self.index,
+                    self.top_k, self.max_batch_size,
+                )
+            except asyncio.CancelledError:
+                # Shutting down mid-batch: release the waiting requests before stopping
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Error during batched context retrieval: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            logger.info(f"Retrieved context for a batch of {len(batch)} queries.")
+            for (_, future), result in zip(batch, results):
+                if not future.done(): # The request may have been cancelled meanwhile
+                    future.set_result(result)
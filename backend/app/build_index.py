@@ -0,0 +1,105 @@
+# backend/app/build_index.py
+"""
+Offline script that builds the FAISS index served by the backend from the
+pre-computed float32 embeddings, and writes a float16 copy of the embeddings
+for the backend to load. The embeddings are L2-normalised first and the index
+uses the inner-product metric, so a search ranks by cosine similarity (the
+metric all-MiniLM-L6-v2 is trained for) with a single dot product per vector.
+
+Run it from the 'backend' directory:
+
+    python -m app.build_index
+
+The default IVF{nlist},SQ8 index searches only the closest inverted lists
+(see FAISS_NPROBE in config.py) and stores each vector component as one byte
+(8-bit scalar quantization), a quarter of the float32 size, instead of scanning
+every full-precision vector like a Flat index. The quantizer is trained on the
+float32 originals, not the float16 copy.
+It is also an IVF index so that the backend can memory-map it (use "IVF1,Flat"
+for exact search, since Flat indexes cannot be memory-mapped).
+
+The number of inverted lists, {nlist} in the factory string, is derived from the
+number of training vectors (see choose_nlist), because FAISS needs at least one
+training vector per list and warns below 39 per list.
+"""
+import argparse
+from pathlib import Path
+import numpy as np
+import faiss
+from .config import SOURCE_EMBEDDINGS_FILE, EMBEDDINGS_FILE, FAISS_INDEX_FILE
+
+DEFAULT_FACTORY = "IVF{nlist},SQ8"
+DEFAULT_TRAIN_SIZE = 100_000
+
+# FAISS warns when k-means has fewer than this many training vectors per inverted list.
+MIN_POINTS_PER_LIST = 39
+
+def choose_nlist(n_train: int) -> int:
+    """
+    Returns the number of inverted lists for n_train training vectors: about 4*sqrt(n),
+    capped so every list gets at least MIN_POINTS_PER_LIST training vectors.
+    """
+    return max(1, min(int(4 * np.sqrt(n_train)), n_train // MIN_POINTS_PER_LIST))
+
+def resolve_factory(factory: str, n_train: int) -> str:
+    """
+    Fills the {nlist} placeholder of a factory string (if any) from the training size.
+    """
+    return factory.replace("{nlist}", str(choose_nlist(n_train)))
+
+def build_index(embeddings, factory: str = DEFAULT_FACTORY, train_size: int = DEFAULT_TRAIN_SIZE, seed: int = 0):
+    """
+    Trains an inner-product FAISS index on a random sample of the embeddings and adds
+    all of them.
+    
+    Args:
+        embeddings (numpy.ndarray): The (n, d) L2-normalised embeddings, one row per text
+            in load_data order.
+        factory (str): The faiss.index_factory description of the index. A {nlist}
+            placeholder is replaced by choose_nlist of the training sample size.
+        train_size (int): The maximum number of embeddings used for training.
+        seed (int): The seed for the training sample.
+    
+    Returns:
+        faiss.Index: The trained index, with each embedding's row number as its id.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, d = embeddings.shape
+    n_train = min(n, train_size)
+    index = faiss.index_factory(d, resolve_factory(factory, n_train), faiss.METRIC_INNER_PRODUCT)
+
+    rng = np.random.default_rng(seed)
+    sample = embeddings[rng.choice(n, size=n_train, replace=False)]
+    index.train(sample)
+
+    # Ids are the row numbers, so search results index straight into the texts list.
+    index.add_with_ids(embeddings, np.arange(n, dtype=np.int64))
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAISS index used by /retrieve.")
+    parser.add_argument("--embeddings", type=Path, default=SOURCE_EMBEDDINGS_FILE,
+                        help="Input .npy file of embeddings.")
+    parser.add_argument("--output", type=Path, default=FAISS_INDEX_FILE,
+                        help="Output FAISS index file.")
+    parser.add_argument("--fp16-output", type=Path, default=EMBEDDINGS_FILE,
+                        help="Output .npy file of the embeddings as float16.")
+    parser.add_argument("--factory", default=DEFAULT_FACTORY,
+                        help="faiss.index_factory description of the index; {nlist} is derived from the data size.")
+    parser.add_argument("--train-size", type=int, default=DEFAULT_TRAIN_SIZE,
+                        help="Maximum number of embeddings used for training.")
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings).astype(np.float32)
+    embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    factory = resolve_factory(args.factory, min(embeddings.shape[0], args.train_size))
+    print(f"Building {factory} index over {embeddings.shape[0]} embeddings of dimension {embeddings.shape[1]}...")
+    index = build_index(embeddings, args.factory, args.train_size)
+    faiss.write_index(index, str(args.output)) # faiss.write_index expects a string path
+    print(f"Index written to {args.output}")
+
+    np.save(args.fp16_output, embeddings.astype(np.float16))
+    print(f"Normalised float16 embeddings written to {args.fp16_output}")
+
+if __name__ == "__main__":
+    main()
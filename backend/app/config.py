@@ -1,13 +1,23 @@
 # backend/app/config.py
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path # Import Path for robust path handling
 
+# Importing this module performs no I/O: the .env file is read on first use of a setting
+# that comes from the environment, and the data files are checked by verify_data_files(),
+# which main.lifespan calls at startup.
+
 # Load environment variables from .env file.
 # It's good practice to place the .env file in the root of the 'backend' directory,
 # one level up from the 'app' directory, so load_dotenv can find it.
 # If your .env is in C:\Users\caket\chatbot-prototype\backend, this will find it.
-load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / '.env')
+@lru_cache(maxsize=None)
+def load_env():
+    """
+    Loads environment variables from the .env file, once per process.
+    """
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / '.env')
 
 # Define the base data directory relative to the current file (config.py).
 # This makes the paths portable across different operating systems and user directories.
@@ -18,21 +28,71 @@ load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / '.env')
 DATA_PATH = Path(__file__).resolve().parent.parent / "data"
 
 CSV_FILE = DATA_PATH / "cube_dashboard_portal_analitik_v3_mapped.csv"
-EMBEDDINGS_FILE = DATA_PATH / "embeddings_reduced2.npy"
-FAISS_INDEX_FILE = DATA_PATH / "faiss_reduced2.index"
+# The original float32 embeddings, only read by app/build_index.py.
+SOURCE_EMBEDDINGS_FILE = DATA_PATH / "embeddings_reduced2.npy"
+# Both built from SOURCE_EMBEDDINGS_FILE by app/build_index.py
+# (run `python -m app.build_index` from 'backend').
+EMBEDDINGS_FILE = DATA_PATH / "embeddings_fp16.npy"
+FAISS_INDEX_FILE = DATA_PATH / "faiss_ivfsq8_ip.index"
+
+# ONNX export of the all-MiniLM-L6-v2 encoder (see onnx_encoder.py for how to create it).
+# The backend falls back to the PyTorch SentenceTransformer when ONNX_MODEL_FILE is missing.
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+ONNX_MODEL_DIR = BACKEND_PATH / "onnx_minilm"
+ONNX_MODEL_FILE = BACKEND_PATH / "onnx_minilm_quantized" / "model_quantized.onnx"
+
+# Number of inverted lists scanned per query by IVF indexes. Higher is more accurate but slower.
+FAISS_NPROBE = 8
+
+# Concurrent /retrieve queries are batched together (see batcher.py): a batch runs once it
+# holds RETRIEVAL_BATCH_SIZE queries or RETRIEVAL_BATCH_WAIT seconds after its first query.
+RETRIEVAL_BATCH_SIZE = 32
+RETRIEVAL_BATCH_WAIT = 0.005
+
+# Maximum number of distinct queries whose LLM plan / retrieved FAISS ids are kept in memory.
+PLAN_CACHE_SIZE = 1024
+RETRIEVAL_CACHE_SIZE = 1024
 
-# Retrieve OpenAI API key from environment variables.
-# Ensure you have OPENAI_API_KEY set in your .env file (e.g., OPENAI_API_KEY="your_api_key_here")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+@lru_cache(maxsize=None)
+def get_openai_api_key() -> str:
+    """
+    Retrieves the OpenAI API key from environment variables.
+    Ensure you have OPENAI_API_KEY set in your .env file (e.g., OPENAI_API_KEY="your_api_key_here")
+    The value is cached; tests can override it with get_openai_api_key.cache_clear().
+    """
+    load_env()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
+    return api_key
 
-# Verify that the necessary files exist.
-# This check is crucial to ensure the application starts correctly.
-# It will raise a FileNotFoundError if any required file is missing.
-for file_path in [CSV_FILE, EMBEDDINGS_FILE, FAISS_INDEX_FILE]:
-    if not file_path.exists(): # Use .exists() method from pathlib.Path
-        raise FileNotFoundError(f"Required data file not found: {file_path}")
+@lru_cache(maxsize=None)
+def get_openai_model() -> str:
+    """
+    Returns the chat model used to plan the data filters (OPENAI_MODEL, default gpt-3.5-turbo).
+    """
+    load_env()
+    return os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 
-# Optional: Add a check for the API key as well
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
+@lru_cache(maxsize=None)
+def get_onnx_num_threads() -> int:
+    """
+    Returns the number of intra-op threads of the ONNX encoder session (ONNX_NUM_THREADS).
+    ONNX Runtime ignores OMP_NUM_THREADS; the default of 0 lets it use one thread per core.
+    """
+    load_env()
+    return int(os.getenv("ONNX_NUM_THREADS", "0"))
 
+def verify_data_files():
+    """
+    Verifies that the necessary files exist.
+    This check is crucial to ensure the application starts correctly.
+    It will raise a FileNotFoundError if any required file is missing.
+    Set SKIP_CONFIG_CHECKS=1 to skip it, e.g. when the files are known to be in place.
+    """
+    load_env()
+    if os.getenv("SKIP_CONFIG_CHECKS") == "1":
+        return
+    for file_path in [CSV_FILE, EMBEDDINGS_FILE, FAISS_INDEX_FILE]:
+        if not file_path.exists(): # Use .exists() method from pathlib.Path
+            raise FileNotFoundError(f"Required data file not found: {file_path}")
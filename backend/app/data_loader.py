@@ -1,25 +1,129 @@
 # backend/app/data_loader.py
+import os
+import numpy as np
 import pandas as pd
+from pyroaring import BitMap
 from .config import CSV_FILE
 
-def safe_value(val, default='Tiada Data'):
+# Columnar sidecar caches stored next to the CSV. They are rebuilt whenever the CSV is newer.
+# Bump CACHE_VERSION whenever the parsed columns or the text format change, so caches
+# written by older code are not reused.
+CACHE_VERSION = 1
+PARQUET_FILE = CSV_FILE.with_suffix(f".v{CACHE_VERSION}.parquet")
+TEXTS_FILE = CSV_FILE.with_suffix(f".v{CACHE_VERSION}.texts.npy")
+
+# Strings (compared case-insensitively after stripping) that are treated as missing data.
+MISSING_VALUES = ['NA', '?', 'N/A', 'NONE']
+
+# Low-cardinality columns stored as pandas categoricals, so comparisons and groupbys
+# work on small integer codes instead of Python strings.
+CATEGORY_COLUMNS = ['jantina', 'negeri', 'daerah', 'etnik', 'oku', 'pendidikan_tertinggi', 'pekerjaan_utama']
+
+# Columns extracted into the code matrix used by filter_and_count, in row order.
+FILTER_COLUMNS = CATEGORY_COLUMNS + ['umur']
+
+# Columns rendered into each row's text representation, paired with their display labels.
+# These are also the only columns read from the CSV.
+TEXT_COLUMNS = {
+    'jantina': 'Jantina',
+    'umur': 'Umur',
+    'daerah': 'Daerah',
+    'negeri': 'Negeri',
+    'etnik': 'Etnik',
+    'oku': 'OKU',
+    'pendidikan_tertinggi': 'Pendidikan Tertinggi',
+    'pekerjaan_utama': 'Pekerjaan',
+    'COUNT': 'Jumlah',
+}
+
+def safe_column(series, default='Tiada Data'):
     """
-    Safely returns a value, replacing NaN or common 'no data' strings with a default.
+    Converts a column to strings, replacing NaN or common 'no data' strings with a default.
+    The replacement is done column-wise so no Python function is called per row.
     
     Args:
-        val: The value to check.
-        default: The default string to return if the value is considered missing.
+        series (pandas.Series): The column to convert.
+        default: The default string to use where the value is considered missing.
     
     Returns:
-        The original value or the default string.
+        pandas.Series: The column as strings, with missing values replaced by the default.
+    """
+    s = series.astype("string")
+    missing = s.isna() | s.str.strip().str.upper().isin(MISSING_VALUES)
+    return s.mask(missing, default)
+
+def rows_to_text(df):
+    """
+    Converts every DataFrame row into a human-readable text string by concatenating
+    whole columns at once instead of formatting each row individually.
+    
+    Args:
+        df (pandas.DataFrame): The loaded DataFrame.
+    
+    Returns:
+        list[str]: A list of text representations for each row.
+    """
+    texts = None
+    for col, label in TEXT_COLUMNS.items():
+        part = f"{label}: " + safe_column(df[col])
+        texts = part if texts is None else texts + ", " + part
+    return texts.tolist()
+
+def _cache_is_fresh(cache_file):
+    """
+    Returns True if the cache file exists and is at least as new as the CSV file.
+    """
+    return cache_file.exists() and cache_file.stat().st_mtime >= CSV_FILE.stat().st_mtime
+
+def _read_csv():
+    """
+    Parses only the columns used downstream, with their types declared up front so the
+    parser doesn't have to infer them, using PyArrow's multithreaded CSV reader.
+    """
+    dtypes = {col: 'category' for col in CATEGORY_COLUMNS}
+    # umur may be missing, so read it as float (NaN) and let _optimise_dtypes downcast it
+    dtypes['umur'] = 'float32'
+    dtypes['COUNT'] = 'Int64'
+    df = pd.read_csv(CSV_FILE, usecols=list(TEXT_COLUMNS), dtype=dtypes, engine='pyarrow')
+    # Fill missing counts with 0 to prevent errors during sum
+    df['COUNT'] = df['COUNT'].fillna(0).astype(np.int64)
+    return df
+
+def _optimise_dtypes(df):
+    """
+    Converts low-cardinality columns to categoricals and downcasts the numeric columns.
+    Columns that already have the target dtype are left untouched.
     """
-    if pd.isna(val) or str(val).strip().upper() in ['NA', '?', 'N/A', 'NONE']: # Added more common missing value indicators
-        return default
-    return val
+    for col in CATEGORY_COLUMNS:
+        # astype always copies, which would duplicate every column already loaded as a
+        # categorical from the Parquet cache.
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    df['umur'] = pd.to_numeric(df['umur'], errors='coerce', downcast='integer')
+    df['COUNT'] = pd.to_numeric(df['COUNT'], downcast='unsigned')
+    return df
+
+def _write_cache(cache_file, write):
+    """
+    Writes a cache file through a temporary path and renames it into place, so a
+    concurrently starting process never reads a partially written file.
+    """
+    # Keep the original suffix last so writers such as np.save don't append their own.
+    tmp_file = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.tmp{cache_file.suffix}")
+    try:
+        write(tmp_file)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        # The cache is only an optimisation; failing to write it must not stop startup.
+        print(f"Warning: Could not write cache file {cache_file}: {e}")
+        tmp_file.unlink(missing_ok=True)
 
 def load_data():
     """
-    Loads the demographic data from the specified CSV file and converts each row into a text string.
+    Loads the demographic data and converts each row into a text string.
+    
+    The CSV is parsed only when it is newer than its Parquet sidecar; otherwise the
+    DataFrame and the derived texts are loaded from the cached files.
     
     Returns:
         tuple: A tuple containing:
@@ -27,9 +131,11 @@ def load_data():
             - list[str]: A list of text representations for each row.
     """
     try:
-        df = pd.read_csv(CSV_FILE)
-        # Ensure 'COUNT' column is numeric, fill NaNs with 0 to prevent errors during sum
-        df['COUNT'] = pd.to_numeric(df['COUNT'], errors='coerce').fillna(0)
+        if _cache_is_fresh(PARQUET_FILE):
+            df = _optimise_dtypes(pd.read_parquet(PARQUET_FILE, columns=list(TEXT_COLUMNS)))
+        else:
+            df = _optimise_dtypes(_read_csv())
+            _write_cache(PARQUET_FILE, lambda path: df.to_parquet(path, index=False))
     except FileNotFoundError:
         print(f"Error: CSV file not found at {CSV_FILE}. Please check your config.py and file path.")
         raise
@@ -37,18 +143,62 @@ def load_data():
         print(f"Error loading or processing CSV file: {e}")
         raise
 
-    def row_to_text(row):
-        """
-        Converts a single DataFrame row into a human-readable text string.
-        """
-        return (
-            f"Jantina: {safe_value(row['jantina'])}, Umur: {safe_value(row['umur'])}, "
-            f"Daerah: {safe_value(row['daerah'])}, Negeri: {safe_value(row['negeri'])}, "
-            f"Etnik: {safe_value(row['etnik'])}, OKU: {safe_value(row['oku'])}, "
-            f"Pendidikan Tertinggi: {safe_value(row['pendidikan_tertinggi'])}, "
-            f"Pekerjaan: {safe_value(row['pekerjaan_utama'])}, Jumlah: {safe_value(row['COUNT'])}"
-        )
-
-    texts = df.apply(row_to_text, axis=1).tolist()
+    if _cache_is_fresh(TEXTS_FILE):
+        texts = np.load(TEXTS_FILE, allow_pickle=True).tolist()
+    else:
+        texts = rows_to_text(df)
+        _write_cache(TEXTS_FILE, lambda path: np.save(path, np.array(texts, dtype=object)))
     return df, texts
 
+def build_column_arrays(df):
+    """
+    Extracts the columns used by filter_and_count into plain NumPy arrays, so each
+    request scans raw integer arrays instead of going through pandas indexing.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame returned by load_data.
+    
+    Returns:
+        tuple: A tuple containing:
+            - numpy.ndarray: An int16 array of shape (len(FILTER_COLUMNS), rows) holding the
+              category codes of each categorical column followed by the 'umur' column.
+              Missing values are stored as -1.
+            - dict[str, dict]: Mapping of value to code per column of FILTER_COLUMNS, in
+              code order. Ages are their own codes.
+            - numpy.ndarray: The 'COUNT' column as int64.
+    """
+    codes = np.empty((len(FILTER_COLUMNS), len(df)), dtype=np.int16)
+    cat_map = {}
+    for row, col in enumerate(CATEGORY_COLUMNS):
+        codes[row] = df[col].cat.codes.to_numpy()
+        cat_map[col] = {v: i for i, v in enumerate(df[col].cat.categories)}
+    codes[-1] = df['umur'].fillna(-1).to_numpy()
+    cat_map['umur'] = {age: age for age in range(int(codes[-1].max()) + 1)}
+    count = df['COUNT'].to_numpy(np.int64)
+    return codes, cat_map, count
+
+def build_row_index(codes, cat_map):
+    """
+    Builds a roaring bitmap of row ids for every value of every categorical column, so
+    filter_and_count can select the rows matching the plan by intersecting compressed
+    bitmaps instead of scanning every row.
+    
+    Args:
+        codes (numpy.ndarray): The code matrix returned by build_column_arrays.
+        cat_map (dict): The value-to-code mapping returned by build_column_arrays.
+    
+    Returns:
+        tuple: A tuple containing:
+            - dict[str, list[BitMap]]: Per categorical column, the bitmap of the rows
+              having each code, indexed by code.
+            - numpy.ndarray: The uint32 ids of all rows, used when no column is filtered.
+    """
+    all_rows = np.arange(codes.shape[1], dtype=np.uint32)
+    bitmaps = {}
+    for row, col in enumerate(CATEGORY_COLUMNS):
+        # Sort the row ids by code once, then slice out each code's (ascending) run of ids.
+        order = np.argsort(codes[row], kind='stable').astype(np.uint32)
+        bounds = np.searchsorted(codes[row][order], np.arange(len(cat_map[col]) + 1))
+        bitmaps[col] = [BitMap(order[bounds[code]:bounds[code + 1]].tolist())
+                        for code in range(len(cat_map[col]))]
+    return bitmaps, all_rows
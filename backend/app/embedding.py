@@ -1,11 +1,17 @@
 # backend/app/embedding.py
 import numpy as np
 import faiss
-from .config import EMBEDDINGS_FILE, FAISS_INDEX_FILE
+from .config import EMBEDDINGS_FILE, FAISS_INDEX_FILE, FAISS_NPROBE
 
 def load_embeddings_and_index():
     """
     Loads pre-computed embeddings and a FAISS index from specified files.
+    For IVF indexes, the number of inverted lists searched is set to FAISS_NPROBE.
+
+    Both files are memory-mapped read-only instead of read into process memory, so
+    multiple workers share the same physical pages through the OS page cache.
+    FAISS only memory-maps the inverted lists of IVF indexes; a Flat index is still
+    read into memory, so build an "IVF1,Flat" index instead if exact search is needed.
     
     Returns:
         tuple: A tuple containing:
@@ -13,8 +19,13 @@ def load_embeddings_and_index():
             - faiss.Index: The loaded FAISS index.
     """
     try:
-        embeddings = np.load(EMBEDDINGS_FILE)
-        index = faiss.read_index(str(FAISS_INDEX_FILE)) # faiss.read_index expects a string path
+        embeddings = np.load(EMBEDDINGS_FILE, mmap_mode='r')
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(str(FAISS_INDEX_FILE), flags) # faiss.read_index expects a string path
+        try:
+            faiss.extract_index_ivf(index).nprobe = FAISS_NPROBE
+        except RuntimeError:
+            pass # Not an IVF index (e.g. Flat), nothing to tune
     except FileNotFoundError:
         print(f"Error: Embedding or FAISS index file not found. "
               f"Embeddings: {EMBEDDINGS_FILE}, FAISS Index: {FAISS_INDEX_FILE}")
@@ -1,15 +1,34 @@
 # backend/app/filter.py
-import pandas as pd
+import numpy as np
+from pyroaring import BitMap
+from . import filter_kernel
+from .data_loader import FILTER_COLUMNS
 
-def filter_and_count(df, plan: dict):
+# Row of each column in the code matrix built by data_loader.build_column_arrays
+COLUMN_ROWS = {col: row for row, col in enumerate(FILTER_COLUMNS)}
+
+# Age bounds used when the plan doesn't restrict the age, wide enough to keep missing ages.
+UMUR_LOWEST = np.iinfo(np.int16).min
+UMUR_HIGHEST = np.iinfo(np.int16).max
+
+def filter_and_count(plan: dict, codes, cat_map: dict, count, bitmaps: dict, all_rows):
     """
-    Filters a DataFrame based on a given plan and calculates total counts
-    and grouped results.
+    Filters the pre-extracted column arrays based on a given plan and calculates
+    total counts and grouped results. The arrays and bitmaps are built once at startup
+    by data_loader.build_column_arrays and data_loader.build_row_index.
+
+    The rows matching the categorical filters are found by intersecting their value
+    bitmaps; the age filter and grouping then run in a single fused pass over just
+    those rows (see filter_kernel).
 
     Args:
-        df (pandas.DataFrame): The input DataFrame to filter.
         plan (dict): A dictionary containing filtering criteria.
                      Example: {"negeri": "Johor", "umur_min": "15", "umur_max": "30"}
+        codes (numpy.ndarray): The code matrix, one row per column of FILTER_COLUMNS.
+        cat_map (dict): Mapping of value to code per column of FILTER_COLUMNS.
+        count (numpy.ndarray): The COUNT value of each row.
+        bitmaps (dict): Per categorical column, the bitmap of row ids for each code.
+        all_rows (numpy.ndarray): The ids of all rows.
 
     Returns:
         dict: A dictionary containing:
@@ -17,10 +36,7 @@ def filter_and_count(df, plan: dict):
             - "groups" (list): A list of dictionaries, each representing
                               a grouped result with a label and data.
     """
-    df_filtered = df.copy() # Work on a copy to avoid modifying the original DataFrame
-
-    # Initialize mask as a Series of True values for all rows
-    mask = pd.Series(True, index=df.index)
+    selected = []
 
     # Define direct filters and their corresponding keys in the plan
     filters_map = {
@@ -34,34 +50,38 @@ def filter_and_count(df, plan: dict):
     }
 
     # Apply direct filters
-    for df_col, plan_key in filters_map.items():
+    for col, plan_key in filters_map.items():
         val = plan.get(plan_key, 'Any') # Use .get() for safer access
         if val != 'Any':
-            # Ensure case-insensitivity for string comparisons if necessary,
-            # but for exact matches, direct comparison is fine.
-            mask &= (df[df_col] == val)
+            code = cat_map[col].get(val)
+            # A value that is not a known category matches no rows
+            selected.append(bitmaps[col][code] if code is not None else BitMap())
+
+    if selected:
+        # Intersect the smallest bitmaps first so the intermediate results stay small
+        selected.sort(key=len)
+        row_ids = np.asarray(BitMap.intersection(*selected).to_array(), dtype=np.uint32)
+    else:
+        row_ids = all_rows
     
     # Apply age range filters
     umur_min_val = plan.get('umur_min', 'Any')
     umur_max_val = plan.get('umur_max', 'Any')
+    umin, umax = UMUR_LOWEST, UMUR_HIGHEST
 
     if umur_min_val != 'Any':
         try:
-            mask &= (df['umur'] >= int(umur_min_val))
+            umin = max(int(umur_min_val), 0)
         except ValueError:
             print(f"Warning: Invalid umur_min value '{umur_min_val}'. Skipping filter.")
     if umur_max_val != 'Any':
         try:
-            mask &= (df['umur'] <= int(umur_max_val))
+            umax = int(umur_max_val)
+            # Missing ages are stored as -1, so an upper bound alone must still exclude them.
+            umin = max(umin, 0)
         except ValueError:
             print(f"Warning: Invalid umur_max value '{umur_max_val}'. Skipping filter.")
     
-    # Apply the combined mask to get the filtered DataFrame
-    df_filtered = df[mask]
-    
-    # Calculate the total count
-    total = int(df_filtered["COUNT"].sum()) if not df_filtered.empty else 0
-    
     # Define fields for grouping results, along with their display labels
     group_fields = {
         'Negeri': 'negeri',
@@ -74,9 +94,8 @@ def filter_and_count(df, plan: dict):
         'Pendidikan Tertinggi': 'pendidikan_tertinggi'
     }
 
-    grouped_results = []
-
-    # Generate grouped results for fields not specified in the plan (i.e., 'Any')
+    # Group by the fields not specified in the plan (i.e., 'Any')
+    grouped_fields = {}
     for label, field_name in group_fields.items():
         # Determine the corresponding key in the 'plan' based on the field_name
         # Special handling for 'oku' to 'status_oku'
@@ -86,18 +105,28 @@ def filter_and_count(df, plan: dict):
         # Also, ensure 'umur' is only grouped if neither umur_min nor umur_max were set
         if field_name == 'umur':
             if plan.get('umur_min', 'Any') == 'Any' and plan.get('umur_max', 'Any') == 'Any':
-                # Group by 'umur' only if no age range was specified
-                if not df_filtered.empty:
-                    grouped_df = df_filtered.groupby(field_name)['COUNT'].sum().reset_index()
-                    # Rename the column to the display label
-                    grouped_df.columns = [label, 'COUNT']
-                    grouped_results.append({"label": label, "data": grouped_df.to_dict(orient="records")})
+                grouped_fields[label] = field_name
         elif plan.get(plan_check_key, 'Any') == 'Any':
-            if not df_filtered.empty:
-                grouped_df = df_filtered.groupby(field_name)['COUNT'].sum().reset_index()
-                # Rename the column to the display label
-                grouped_df.columns = [label, 'COUNT']
-                grouped_results.append({"label": label, "data": grouped_df.to_dict(orient="records")})
+            grouped_fields[label] = field_name
 
-    return {"total": total, "groups": grouped_results}
+    # Filter by age, total and group in one pass over the selected rows
+    group_rows = np.array([COLUMN_ROWS[f] for f in grouped_fields.values()], dtype=np.int64)
+    group_sizes = np.array([len(cat_map[f]) for f in grouped_fields.values()], dtype=np.int64)
+    total, matched, sums, rows = filter_kernel.run(codes, count, row_ids, umin, umax,
+                                                   COLUMN_ROWS['umur'], group_rows, group_sizes)
 
+    grouped_results = []
+    if not matched:
+        return {"total": total, "groups": grouped_results}
+
+    for (label, field_name), field_sums, field_rows in zip(grouped_fields.items(), sums, rows):
+        # Only visit the codes that occur in the filtered rows (like groupby with observed=True),
+        # converting the sums to Python ints in one call rather than one numpy scalar at a time.
+        values = list(cat_map[field_name])
+        field_sums = field_sums.tolist()
+        grouped_results.append({"label": label, "data": [
+            {label: values[code], 'COUNT': field_sums[code]}
+            for code in np.flatnonzero(field_rows).tolist()
+        ]})
+
+    return {"total": total, "groups": grouped_results}
@@ -0,0 +1,86 @@
+# backend/app/filter_kernel.py
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+@njit(cache=True)
+def _accumulate(codes, count, row_ids, umin, umax, umur_row, group_rows, group_offsets,
+                start, stop, sums, rows):
+    """
+    Runs the age filter and grouping over row_ids[start:stop] and returns the filtered
+    total and number of matching rows. Grouped sums and row counts are added to the
+    given per-bin arrays.
+    """
+    total = 0
+    matched = 0
+    for k in range(start, stop):
+        i = row_ids[k]
+        age = codes[umur_row, i]
+        if age < umin or age > umax:
+            continue
+        total += count[i]
+        matched += 1
+        for g in range(group_rows.shape[0]):
+            code = codes[group_rows[g], i]
+            if code >= 0: # Missing values are not grouped
+                sums[group_offsets[g] + code] += count[i]
+                rows[group_offsets[g] + code] += 1
+    return total, matched
+
+@njit(parallel=True, cache=True)
+def _run(codes, count, row_ids, umin, umax, umur_row, group_rows, group_offsets, n_bins, n_chunks):
+    n = row_ids.shape[0]
+    chunk = (n + n_chunks - 1) // n_chunks
+    totals = np.zeros(n_chunks, np.int64)
+    matched = np.zeros(n_chunks, np.int64)
+    # Each chunk accumulates into its own row, so the parallel loop has no shared writes.
+    sums = np.zeros((n_chunks, n_bins), np.int64)
+    rows = np.zeros((n_chunks, n_bins), np.int64)
+    for t in prange(n_chunks):
+        start = t * chunk
+        stop = min(start + chunk, n)
+        chunk_total, chunk_matched = _accumulate(codes, count, row_ids, umin, umax, umur_row,
+                                                 group_rows, group_offsets, start, stop,
+                                                 sums[t], rows[t])
+        totals[t] = chunk_total
+        matched[t] = chunk_matched
+
+    total_sums = np.zeros(n_bins, np.int64)
+    total_rows = np.zeros(n_bins, np.int64)
+    for t in range(n_chunks):
+        total_sums += sums[t]
+        total_rows += rows[t]
+    return totals.sum(), matched.sum(), total_sums, total_rows
+
+def run(codes, count, row_ids, umin, umax, umur_row, group_rows, group_sizes):
+    """
+    Filters the selected rows by age and groups them in a single parallel pass.
+
+    Args:
+        codes (numpy.ndarray): The int16 code matrix from data_loader.build_column_arrays.
+        count (numpy.ndarray): The int64 COUNT value of each row.
+        row_ids (numpy.ndarray): The uint32 ids of the rows matching the categorical
+            filters, in ascending order (see data_loader.build_row_index).
+        umin (int): The inclusive lower bound on the age row.
+        umax (int): The inclusive upper bound on the age row.
+        umur_row (int): The index of the age row in `codes`.
+        group_rows (numpy.ndarray): The indices of the rows of `codes` to group by.
+        group_sizes (numpy.ndarray): The number of distinct codes of each grouped row.
+
+    Returns:
+        tuple: A tuple containing:
+            - int: The total count of the filtered rows.
+            - int: The number of filtered rows.
+            - list[numpy.ndarray]: The summed count per code, for each grouped row.
+            - list[numpy.ndarray]: The number of filtered rows per code, for each grouped row.
+    """
+    offsets = np.zeros(len(group_sizes) + 1, np.int64)
+    np.cumsum(group_sizes, out=offsets[1:])
+    n_chunks = max(1, min(get_num_threads(), len(row_ids)))
+    total, matched, sums, rows = _run(codes, count, row_ids, umin, umax, umur_row, group_rows,
+                                      offsets[:-1], offsets[-1], n_chunks)
+    return (
+        int(total),
+        int(matched),
+        [sums[offsets[g]:offsets[g + 1]] for g in range(len(group_sizes))],
+        [rows[offsets[g]:offsets[g + 1]] for g in range(len(group_sizes))],
+    )
@@ -1,28 +1,27 @@
 # backend/app/llm.py
 from openai import OpenAI
+from copy import deepcopy
+from functools import lru_cache
+import orjson
 import os
 import logging # Import logging for better output than print
-from .config import OPENAI_API_KEY
+from .config import get_openai_api_key, get_openai_model, PLAN_CACHE_SIZE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Initialize the OpenAI client once.
-# The API key is loaded from config.py, which gets it from the environment.
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def ask_gpt_to_plan(user_query: str) -> str:
+@lru_cache(maxsize=None)
+def get_client() -> OpenAI:
     """
-    Sends a user query to GPT-3.5-turbo to generate a data filtering plan
-    in JSON format.
-
-    Args:
-        user_query (str): The user's natural language question about the data.
-
-    Returns:
-        str: A JSON string representing the filtering plan.
+    Initializes the OpenAI client once, on first use.
+    The API key is loaded from config.py, which gets it from the environment.
     """
-    system_prompt = """
+    return OpenAI(api_key=get_openai_api_key())
+
+# The system prompt is the same for every request, so it is defined once here.
+# Note: at roughly 700 tokens it is below the 1024-token minimum of OpenAI's automatic
+# prompt caching, so requests currently get no prompt-caching discount.
+SYSTEM_PROMPT = """
 You are a smart data analyst. Your task is to interpret user queries (in Malay or English)
 and extract relevant demographic filtering rules. You must always output a JSON object
 containing the specified fields. If a field is not mentioned or implied by the query,
@@ -96,20 +95,61 @@ Return your output strictly in this JSON format. No extra text or markdown outsi
 ```
 """
 
+class InvalidPlanError(ValueError):
+    """
+    Raised when the model's output is not a JSON object.
+    """
+
+def ask_gpt_to_plan(user_query: str) -> dict:
+    """
+    Sends a user query to the configured chat model (see config.get_openai_model) to generate a data filtering plan
+    in JSON format, and parses it. Plans are cached per query (ignoring surrounding and repeated
+    whitespace), so repeated questions don't call the API again. Only plans that
+    parse as a JSON object are cached.
+
+    Args:
+        user_query (str): The user's natural language question about the data.
+
+    Returns:
+        dict: The filtering plan. Each call returns its own copy, so callers may modify it.
+
+    Raises:
+        InvalidPlanError: If the model did not return a JSON object.
+    """
+    # lru_cache hands out the same object on every hit, so never return the cached plan itself
+    return deepcopy(_ask_gpt_to_plan(" ".join(user_query.split())))
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _ask_gpt_to_plan(user_query: str) -> dict:
+    """
+    Uncached implementation of ask_gpt_to_plan. The output is validated here so that failed
+    calls and invalid plans raise, and are therefore not cached.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # You can make this configurable via config.py if needed
+        response = get_client().chat.completions.create(
+            model=get_openai_model(),
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_query}
             ],
             response_format={"type": "json_object"} # Ensure JSON output
         )
         # Log the full response for debugging
         logging.info(f"GPT Response: {response.choices[0].message.content}")
-        return response.choices[0].message.content
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        if details is not None and details.cached_tokens is not None:
+            logging.info(f"GPT prompt tokens: {response.usage.prompt_tokens} ({details.cached_tokens} cached)")
+        content = response.choices[0].message.content
     except Exception as e:
         logging.error(f"Error calling OpenAI API: {e}")
         # Re-raise the exception or return a structured error response
         raise
 
+    try:
+        plan = orjson.loads(content)
+    except orjson.JSONDecodeError as e:
+        raise InvalidPlanError(f"GPT returned invalid JSON: {e}\nRaw plan: {content}") from e
+    # Basic validation of the plan structure
+    if not isinstance(plan, dict):
+        raise InvalidPlanError(f"GPT did not return a valid JSON dictionary.\nRaw plan: {content}")
+    return plan
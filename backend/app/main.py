@@ -1,19 +1,22 @@
 # backend/app/main.py
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
-import json
 import logging
 import time
 
 # Local imports
-from .llm import ask_gpt_to_plan
+from .llm import ask_gpt_to_plan, InvalidPlanError
 from .filter import filter_and_count
-from .retrieval import retrieve_context
-from .data_loader import load_data
+from .batcher import RetrievalBatcher
+from .config import RETRIEVAL_BATCH_SIZE, RETRIEVAL_BATCH_WAIT, ONNX_MODEL_DIR, ONNX_MODEL_FILE
+from .config import verify_data_files, get_openai_api_key, get_onnx_num_threads
+from .data_loader import load_data, build_column_arrays, build_row_index
 from .embedding import load_embeddings_and_index # Import for embeddings and index
+from .onnx_encoder import OnnxEncoder # ONNX Runtime version of the model
 from sentence_transformers import SentenceTransformer # Import for the model
 
 # Configure logging for the FastAPI application
@@ -30,16 +33,39 @@ async def lifespan(app: FastAPI):
     Loads shared resources at startup and cleans them up at shutdown.
     """
     logger.info("Application startup: Loading shared resources...")
+
+    # Verify the configuration before loading anything
+    try:
+        verify_data_files()
+        get_openai_api_key()
+    except Exception as e:
+        logger.critical(f"Invalid configuration: {e}")
+        raise HTTPException(status_code=500, detail=f"Backend startup failed: Configuration error - {e}")
     
     # Load DataFrame and texts
     try:
-        app.state.df, app.state.texts = load_data()
+        app.state.df, texts = load_data()
+        # A tuple is immutable and can be indexed by itemgetter in one call during retrieval
+        app.state.texts = tuple(texts)
         logger.info(f"DataFrame loaded successfully with {len(app.state.df)} rows.")
     except Exception as e:
         logger.critical(f"Failed to load data: {e}")
         # Depending on criticality, you might want to exit here or handle gracefully
         raise HTTPException(status_code=500, detail=f"Backend startup failed: Data loading error - {e}")
 
+    # Extract the filter columns into NumPy arrays and per-value row bitmaps once,
+    # so /ask doesn't touch pandas per request
+    try:
+        app.state.codes, app.state.cat_map, app.state.count = build_column_arrays(app.state.df)
+        app.state.bitmaps, app.state.all_rows = build_row_index(app.state.codes, app.state.cat_map)
+        # Run one unfiltered query so the filter kernel is compiled before the first request
+        filter_and_count({}, app.state.codes, app.state.cat_map, app.state.count,
+                         app.state.bitmaps, app.state.all_rows)
+        logger.info("Filter column arrays and row bitmaps prepared, filter kernel compiled.")
+    except Exception as e:
+        logger.critical(f"Failed to prepare filter column arrays: {e}")
+        raise HTTPException(status_code=500, detail=f"Backend startup failed: Data preparation error - {e}")
+
     # Load embeddings and FAISS index
     try:
         app.state.embeddings, app.state.faiss_index = load_embeddings_and_index()
@@ -48,20 +74,41 @@ async def lifespan(app: FastAPI):
         logger.critical(f"Failed to load embeddings/FAISS index: {e}")
         raise HTTPException(status_code=500, detail=f"Backend startup failed: Embedding error - {e}")
 
-    # Load SentenceTransformer model
+    # Load the sentence encoder, preferring the quantized ONNX export when it has been created
     try:
-        app.state.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("SentenceTransformer model loaded.")
+        if ONNX_MODEL_FILE.exists():
+            app.state.embedder = OnnxEncoder(ONNX_MODEL_FILE, ONNX_MODEL_DIR,
+                                             num_threads=get_onnx_num_threads())
+            logger.info(f"ONNX encoder loaded from {ONNX_MODEL_FILE}.")
+        else:
+            logger.warning(f"ONNX model not found at {ONNX_MODEL_FILE}, using the PyTorch SentenceTransformer.")
+            app.state.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+            logger.info("SentenceTransformer model loaded.")
     except Exception as e:
-        logger.critical(f"Failed to load SentenceTransformer model: {e}")
+        logger.critical(f"Failed to load sentence encoder model: {e}")
         raise HTTPException(status_code=500, detail=f"Backend startup failed: Model loading error - {e}")
 
+    # Start the batcher that groups concurrent /retrieve queries into one encode and search
+    app.state.retrieval_batcher = RetrievalBatcher(
+        app.state.texts, app.state.embedder, app.state.faiss_index,
+        max_batch_size=RETRIEVAL_BATCH_SIZE, max_wait=RETRIEVAL_BATCH_WAIT,
+    )
+    app.state.retrieval_batcher.start()
+    logger.info("Retrieval batcher started.")
+
     yield # Application will run here
 
     logger.info("Application shutdown: Cleaning up resources (if any).")
     # You can add cleanup code here if needed, e.g., closing connections.
+    await app.state.retrieval_batcher.stop()
+    del app.state.retrieval_batcher
     del app.state.df
     del app.state.texts
+    del app.state.codes
+    del app.state.cat_map
+    del app.state.count
+    del app.state.bitmaps
+    del app.state.all_rows
     del app.state.embeddings
     del app.state.faiss_index
     del app.state.embedder
@@ -69,7 +116,8 @@ async def lifespan(app: FastAPI):
 
 
 # Initialize FastAPI app with the lifespan context manager
-app = FastAPI(lifespan=lifespan)
+# Responses are serialised with orjson, which is much faster than the stdlib json module
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # --- CORS Configuration ---
 # Allow Cross-Origin Resource Sharing.
@@ -99,32 +147,22 @@ async def ask_user_question(request: QueryRequest):
     logger.info(f"Received query: '{request.user_query}'")
 
     try:
-        # Step 1: Get filtering plan from LLM
-        plan_json = ask_gpt_to_plan(request.user_query)
+        # Step 1: Get the parsed and validated filtering plan from LLM
+        plan = ask_gpt_to_plan(request.user_query)
         gpt_time = time.time() - start_time
         logger.info(f"GPT planning took {gpt_time:.2f} seconds.")
+    except InvalidPlanError as e:
+        logger.error(f"Invalid plan returned by GPT: {e}")
+        raise HTTPException(status_code=500, detail="Invalid analysis plan from AI.")
     except Exception as e:
         logger.error(f"Error during GPT planning: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query with AI: {e}")
 
-    try:
-        # Step 2: Parse the JSON plan from LLM
-        plan = json.loads(plan_json)
-        # Basic validation of the plan structure
-        if not isinstance(plan, dict):
-            raise ValueError("GPT did not return a valid JSON dictionary.")
-    except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON plan returned by GPT: {e}\nRaw plan: {plan_json}")
-        raise HTTPException(status_code=500, detail="Invalid analysis plan from AI.")
-    except ValueError as e:
-        logger.error(f"Plan validation error: {e}")
-        raise HTTPException(status_code=500, detail=f"AI plan structure is incorrect: {e}")
-
-
-    # Step 3: Filter and count data using the loaded DataFrame
+    # Step 2: Filter and count data using the pre-extracted column arrays
     start_filter = time.time()
     try:
-        answer = filter_and_count(app.state.df, plan)
+        answer = filter_and_count(plan, app.state.codes, app.state.cat_map, app.state.count,
+                                  app.state.bitmaps, app.state.all_rows)
         filter_time = time.time() - start_filter
         logger.info(f"Filtering took {filter_time:.2f} seconds.")
     except Exception as e:
@@ -144,14 +182,14 @@ async def ask_user_question(request: QueryRequest):
 async def retrieve_context_docs(request: QueryRequest):
     """
     Retrieves relevant context documents based on a user query using pre-loaded
-    SentenceTransformer and FAISS index.
+    SentenceTransformer and FAISS index. Concurrent queries are batched together.
     """
     start_time = time.time()
     logger.info(f"Received retrieval query: '{request.user_query}'")
 
     try:
-        # Use the pre-loaded texts, embedder, and faiss_index from app.state
-        context = retrieve_context(request.user_query, app.state.texts, app.state.embedder, app.state.faiss_index)
+        # The batcher uses the pre-loaded texts, embedder, and faiss_index from app.state
+        context = await app.state.retrieval_batcher.retrieve(request.user_query)
         retrieval_time = time.time() - start_time
         logger.info(f"Context retrieval took {retrieval_time:.2f} seconds.")
         return {"results": context}
@@ -170,5 +208,6 @@ async def health_check():
 if __name__ == "__main__":
     # The `app` object is now initialized with the lifespan context manager.
     # `reload=True` is useful for development as it restarts the server on code changes.
+    # For production, run several workers with Gunicorn instead (see gunicorn.conf.py).
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
@@ -0,0 +1,68 @@
+# backend/app/onnx_encoder.py
+"""
+Runs the all-MiniLM-L6-v2 sentence encoder with ONNX Runtime instead of PyTorch.
+
+Export and quantize the model once from the 'backend' directory. The commands need
+Hugging Face Optimum (pip install "optimum[onnxruntime]"), which the backend itself
+doesn't import, so it isn't in requirements.txt:
+
+    optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 onnx_minilm/
+    optimum-cli onnxruntime quantize --onnx_model onnx_minilm/ --avx512_vnni -o onnx_minilm_quantized/
+
+The first command also saves the tokenizer into onnx_minilm/. The second writes the
+int8 model to onnx_minilm_quantized/model_quantized.onnx (see ONNX_MODEL_FILE in config.py).
+"""
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+class OnnxEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode with the all-MiniLM-L6-v2 pipeline:
+    tokenize, run the transformer, mean-pool over the tokens and L2-normalise.
+    """
+
+    def __init__(self, model_file, tokenizer_dir, max_seq_length: int = 256, num_threads: int = 0):
+        """
+        Args:
+            model_file (Path): The exported (optionally quantized) ONNX model.
+            tokenizer_dir (Path): The directory holding the model's tokenizer files.
+            max_seq_length (int): Inputs are truncated to this many tokens, as in SentenceTransformer.
+            num_threads (int): The number of intra-op threads, or 0 for one per core.
+        """
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_file), options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(tokenizer_dir))
+        self.max_seq_length = max_seq_length
+
+    def encode(self, sentences: list[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        """
+        Encodes sentences into normalised embeddings.
+
+        Args:
+            sentences (list[str]): The sentences to encode.
+            batch_size (int): The number of sentences per session run.
+            convert_to_numpy (bool): Accepted for compatibility; the result is always a numpy array.
+            normalize_embeddings (bool): Accepted for compatibility; the embeddings are always
+                normalised, as the all-MiniLM-L6-v2 pipeline ends with a normalisation layer.
+
+        Returns:
+            numpy.ndarray: A (len(sentences), dim) float32 array of unit-length embeddings.
+        """
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean-pool over the real (non-padding) tokens
+            mask = tokens['attention_mask'][..., np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        return np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
@@ -1,40 +1,121 @@
 # backend/app/retrieval.py
+from collections import OrderedDict
+import hashlib
+from operator import itemgetter
+import threading
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np # Import numpy for array handling
+from .config import RETRIEVAL_CACHE_SIZE
+from .onnx_encoder import OnnxEncoder
 
 # This module no longer loads embeddings and index directly.
 # Instead, it receives them as arguments, making it reusable with
 # pre-loaded components.
 
-def retrieve_context(query: str, texts: list[str], embedder: SentenceTransformer, index: faiss.Index, top_k: int = 10) -> list[str]:
+# LRU cache of query hash -> tuple of FAISS ids. Only the ids are stored, so entries stay
+# small and the texts are looked up again on each hit.
+_ids_cache = OrderedDict()
+_ids_cache_lock = threading.Lock()
+
+def _cache_key(query: str, top_k: int) -> bytes:
     """
-    Retrieves the most relevant text contexts from a corpus based on a user query.
+    Hashes a query (ignoring surrounding and repeated whitespace) together with top_k.
+    """
+    normalised = " ".join(query.split())
+    return hashlib.blake2b(f"{top_k}:{normalised}".encode(), digest_size=16).digest()
+
+def _get_cached_ids(keys: list[bytes]) -> list:
+    """
+    Returns the cached ids for each key, or None where the key is not cached.
+    """
+    with _ids_cache_lock:
+        found = []
+        for key in keys:
+            ids = _ids_cache.get(key)
+            if ids is not None:
+                _ids_cache.move_to_end(key)
+            found.append(ids)
+        return found
+
+def _cache_ids(key: bytes, ids: tuple):
+    """
+    Stores the ids for a key, evicting the least recently used entry when full.
+    """
+    with _ids_cache_lock:
+        _ids_cache[key] = ids
+        _ids_cache.move_to_end(key)
+        if len(_ids_cache) > RETRIEVAL_CACHE_SIZE:
+            _ids_cache.popitem(last=False)
+
+def _lookup_texts(texts: tuple[str, ...], ids: tuple) -> list[str]:
+    """
+    Returns the texts at the given ids, fetched with a single itemgetter call.
+    """
+    if len(ids) > 1:
+        return list(itemgetter(*ids)(texts))
+    return [texts[i] for i in ids] # itemgetter returns a bare item for a single id
+
+def retrieve_contexts(queries: list[str], texts: tuple[str, ...], embedder: SentenceTransformer | OnnxEncoder, index: faiss.Index, top_k: int = 10, batch_size: int = 32) -> list[list[str]]:
+    """
+    Retrieves the most relevant text contexts for several queries at once, encoding
+    them in one batch and running a single FAISS search for all of them. Queries
+    whose results are cached skip the encoder and the search.
     
     Args:
-        query (str): The user's natural language query.
-        texts (list[str]): The list of all available text documents.
-        embedder (SentenceTransformer): The pre-loaded SentenceTransformer model.
+        queries (list[str]): The user's natural language queries.
+        texts (tuple[str, ...]): All available text documents, indexed by FAISS id.
+        embedder (SentenceTransformer | OnnxEncoder): The pre-loaded sentence encoder.
         index (faiss.Index): The pre-loaded FAISS index.
-        top_k (int): The number of top relevant contexts to retrieve.
+        top_k (int): The number of top relevant contexts to retrieve per query.
+        batch_size (int): The batch size used by the embedder.
         
     Returns:
-        list[str]: A list of top_k most relevant text contexts.
+        list[list[str]]: The top_k most relevant text contexts for each query, in query order.
     """
     try:
-        # Encode the query using the pre-loaded embedder model.
-        query_embedding = embedder.encode([query], convert_to_numpy=True)
-        
-        # Perform a similarity search on the FAISS index.
-        # distances: distances to the nearest neighbors
-        # indices: indices of the nearest neighbors in the original embeddings array
-        distances, indices = index.search(query_embedding, top_k)
+        keys = [_cache_key(query, top_k) for query in queries]
+        results = _get_cached_ids(keys)
+        misses = [j for j, ids in enumerate(results) if ids is None]
+
+        if misses:
+            # Encode all uncached queries in one forward pass of the pre-loaded embedder model.
+            # The index holds normalised vectors and ranks by inner product, so the queries
+            # are normalised too, making the scores cosine similarities.
+            query_embeddings = embedder.encode([queries[j] for j in misses], batch_size=batch_size,
+                                               convert_to_numpy=True, normalize_embeddings=True)
+            # FAISS only accepts float32 queries; the index handles its quantized codes internally.
+            query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+            
+            # Perform a similarity search on the FAISS index.
+            # distances: distances to the nearest neighbors
+            # indices: indices of the nearest neighbors in the original embeddings array,
+            # one row of top_k indices per query
+            distances, indices = index.search(query_embeddings, top_k)
+            
+            for j, row in zip(misses, indices):
+                # IVF indexes return -1 when the probed lists hold fewer than top_k vectors.
+                results[j] = tuple(int(i) for i in row if i >= 0)
+                _cache_ids(keys[j], results[j])
         
         # Retrieve the actual text documents using the found indices.
-        # indices[0] because index.search returns a 2D array (batch size x top_k),
-        # and we only have one query (batch size 1).
-        return [texts[i] for i in indices[0]]
+        return [_lookup_texts(texts, ids) for ids in results]
     except Exception as e:
         print(f"Error during context retrieval: {e}")
-        return [] # Return empty list on error
+        return [[] for _ in queries] # Return empty lists on error
 
+def retrieve_context(query: str, texts: tuple[str, ...], embedder: SentenceTransformer | OnnxEncoder, index: faiss.Index, top_k: int = 10) -> list[str]:
+    """
+    Retrieves the most relevant text contexts from a corpus based on a user query.
+    
+    Args:
+        query (str): The user's natural language query.
+        texts (tuple[str, ...]): All available text documents, indexed by FAISS id.
+        embedder (SentenceTransformer | OnnxEncoder): The pre-loaded sentence encoder.
+        index (faiss.Index): The pre-loaded FAISS index.
+        top_k (int): The number of top relevant contexts to retrieve.
+        
+    Returns:
+        list[str]: A list of top_k most relevant text contexts.
+    """
+    return retrieve_contexts([query], texts, embedder, index, top_k)[0]
@@ -0,0 +1,164 @@
+# backend/app/test_filter.py
+# Checks filter_and_count against the original pandas implementation. Run from 'backend':
+#
+#     python -m pytest -q app/test_filter.py
+import random
+
+import pandas as pd
+import pytest
+
+from . import data_loader
+from .filter import filter_and_count
+
+VALUES = {
+    'jantina': ['Lelaki', 'Perempuan'],
+    'negeri': ['Selangor', 'Johor', 'Perak'],
+    'daerah': ['Petaling', 'Batu Pahat', 'Kinta', 'Klang'],
+    'etnik': ['Melayu', 'Cina', 'India'],
+    'oku': ['OKU', 'Bukan OKU'],
+    'pendidikan_tertinggi': ['Rendah', 'Menengah Atas', 'Ijazah'],
+    'pekerjaan_utama': ['Pelajar', 'Menganggur', 'Suri Rumah'],
+}
+
+PLANS = [
+    {},
+    {'negeri': 'Johor'},
+    {'status_oku': 'OKU'},
+    {'negeri': 'Selangor', 'jantina': 'Perempuan', 'etnik': 'India'},
+    {'negeri': 'Kedah'},
+    {'negeri': 'Johor', 'daerah': 'Kinta', 'pekerjaan_utama': 'Pelajar', 'etnik': 'Cina',
+     'jantina': 'Lelaki', 'umur_min': '80', 'umur_max': '80'},
+    {'umur_min': '15', 'umur_max': '30'},
+    {'umur_min': '-5'},
+    {'umur_min': '0'},
+    {'umur_max': '12'},
+    {'umur_max': '-1'},
+    {'umur_min': 'x', 'umur_max': '40'},
+    {'umur_min': 'x'},
+    {'negeri': 'Perak', 'umur_min': '30', 'pendidikan_tertinggi': 'Ijazah'},
+    {'negeri': 'Any', 'jantina': 'Any', 'umur_min': 'Any'},
+]
+
+def pandas_filter_and_count(df, plan):
+    """
+    The original DataFrame implementation of filter_and_count, used as the reference.
+    """
+    mask = pd.Series(True, index=df.index)
+    filters_map = {
+        'negeri': 'negeri',
+        'daerah': 'daerah',
+        'jantina': 'jantina',
+        'etnik': 'etnik',
+        'pekerjaan_utama': 'pekerjaan_utama',
+        'oku': 'status_oku',
+        'pendidikan_tertinggi': 'pendidikan_tertinggi',
+    }
+    for col, plan_key in filters_map.items():
+        val = plan.get(plan_key, 'Any')
+        if val != 'Any':
+            mask &= (df[col] == val)
+
+    umur_min_val = plan.get('umur_min', 'Any')
+    umur_max_val = plan.get('umur_max', 'Any')
+    if umur_min_val != 'Any':
+        try:
+            mask &= (df['umur'] >= int(umur_min_val))
+        except ValueError:
+            pass
+    if umur_max_val != 'Any':
+        try:
+            mask &= (df['umur'] <= int(umur_max_val))
+        except ValueError:
+            pass
+
+    df_filtered = df[mask]
+    total = int(df_filtered["COUNT"].sum()) if not df_filtered.empty else 0
+
+    group_fields = {
+        'Negeri': 'negeri',
+        'Daerah': 'daerah',
+        'Jantina': 'jantina',
+        'Etnik': 'etnik',
+        'Umur': 'umur',
+        'Status OKU': 'oku',
+        'Pekerjaan Utama': 'pekerjaan_utama',
+        'Pendidikan Tertinggi': 'pendidikan_tertinggi'
+    }
+    grouped_results = []
+    for label, field_name in group_fields.items():
+        plan_check_key = 'status_oku' if field_name == 'oku' else field_name
+        if field_name == 'umur':
+            if plan.get('umur_min', 'Any') != 'Any' or plan.get('umur_max', 'Any') != 'Any':
+                continue
+        elif plan.get(plan_check_key, 'Any') != 'Any':
+            continue
+        if df_filtered.empty:
+            continue
+        grouped_df = df_filtered.groupby(field_name)['COUNT'].sum().reset_index()
+        grouped_df.columns = [label, 'COUNT']
+        # Ages with missing values are read as floats, and counts as floats when a count
+        # is missing; the JSON response carries them as integers.
+        grouped_results.append({"label": label, "data": [
+            {label: int(r[label]) if field_name == 'umur' else r[label], 'COUNT': int(r['COUNT'])}
+            for r in grouped_df.to_dict(orient="records")
+        ]})
+    return {"total": total, "groups": grouped_results}
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    """
+    Writes a CSV with missing ages, categories and counts, and loads it both through
+    data_loader (as the backend does) and with a plain pd.read_csv (as the original did).
+    """
+    rng = random.Random(0)
+    rows = []
+    for _ in range(2000):
+        row = {col: rng.choice(values) for col, values in VALUES.items()}
+        # Some categories are missing, empty or use one of the 'no data' markers.
+        col = rng.choice(list(VALUES))
+        row[col] = rng.choice([row[col]] * 6 + ['', 'NA', '?'])
+        row['umur'] = rng.choice([''] * 5 + list(range(0, 90)))
+        row['COUNT'] = rng.choice([''] + list(range(0, 50)) * 3)
+        rows.append(row)
+
+    csv_file = tmp_path_factory.mktemp("data") / "cube.csv"
+    pd.DataFrame(rows, columns=list(data_loader.TEXT_COLUMNS)).to_csv(csv_file, index=False)
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(data_loader, "CSV_FILE", csv_file)
+    patch.setattr(data_loader, "PARQUET_FILE", csv_file.with_suffix(".parquet"))
+    patch.setattr(data_loader, "TEXTS_FILE", csv_file.with_suffix(".texts.npy"))
+    try:
+        df, _ = data_loader.load_data()
+    finally:
+        patch.undo()
+    codes, cat_map, count = data_loader.build_column_arrays(df)
+    bitmaps, all_rows = data_loader.build_row_index(codes, cat_map)
+
+    reference = pd.read_csv(csv_file)
+    reference['COUNT'] = pd.to_numeric(reference['COUNT'], errors='coerce').fillna(0)
+    return reference, (codes, cat_map, count, bitmaps, all_rows)
+
+@pytest.mark.parametrize("plan", PLANS, ids=str)
+def test_matches_pandas(dataset, plan):
+    reference, arrays = dataset
+    assert filter_and_count(plan, *arrays) == pandas_filter_and_count(reference, plan)
+
+def test_matches_pandas_random_plans(dataset):
+    reference, arrays = dataset
+    rng = random.Random(1)
+    plan_keys = {col: 'status_oku' if col == 'oku' else col for col in VALUES}
+    for _ in range(200):
+        plan = {}
+        for col, key in plan_keys.items():
+            if rng.random() < 0.3:
+                plan[key] = rng.choice(VALUES[col] + ['Tiada', 'Any'])
+        if rng.random() < 0.4:
+            plan['umur_min'] = rng.choice(['-3', '0', '18', '45', 'x', 'Any'])
+        if rng.random() < 0.4:
+            plan['umur_max'] = rng.choice(['-3', '12', '30', '60', 'Any'])
+        assert filter_and_count(plan, *arrays) == pandas_filter_and_count(reference, plan), plan
+
+def test_no_match_has_no_groups(dataset):
+    _, arrays = dataset
+    assert filter_and_count({'negeri': 'Kedah'}, *arrays) == {"total": 0, "groups": []}
@@ -0,0 +1,33 @@
+# backend/gunicorn.conf.py
+# Production server configuration. Run from the 'backend' directory:
+#
+#     gunicorn app.main:app -c gunicorn.conf.py
+#
+# Each worker runs the FastAPI lifespan on its own, so every process loads its own
+# DataFrame and models. The embeddings and the FAISS inverted lists are memory-mapped
+# read-only (see embedding.py), so their pages are shared by all workers through the
+# OS page cache rather than duplicated. preload_app imports the application (and its
+# heavy libraries) once in the master process before forking the workers.
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+preload_app = True
+
+# A worker sends no heartbeat to the master until the lifespan finishes, and all workers
+# run it at the same time (CSV/Parquet load, row bitmaps, Numba compile, model load). With
+# gunicorn's default 30 s timeout they would be killed and restarted in a loop, so allow
+# enough time for startup. Raise GUNICORN_TIMEOUT if startup takes longer on a host.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+
+# Every worker would otherwise start one compute thread per core in Numba, FAISS (OpenMP)
+# and ONNX Runtime, oversubscribing the CPU. Split the cores between the workers instead.
+# OMP_NUM_THREADS and NUMBA_NUM_THREADS must be set before the libraries are imported,
+# which preload_app does next. ONNX Runtime doesn't read OMP_NUM_THREADS, so its session
+# gets the same value through ONNX_NUM_THREADS (see config.get_onnx_num_threads).
+_threads_per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+os.environ.setdefault("OMP_NUM_THREADS", _threads_per_worker)
+os.environ.setdefault("NUMBA_NUM_THREADS", _threads_per_worker)
+os.environ.setdefault("ONNX_NUM_THREADS", _threads_per_worker)